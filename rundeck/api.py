@@ -2,22 +2,32 @@
 Python module for the Rundeck API
 '''
 from __future__ import absolute_import, print_function, unicode_literals
+import logging
+import re
+import time
+from xml.sax.saxutils import escape as xml_escape
 
-from functools import partial
-from xml.sax.saxutils import quoteattr
 try:
-    from urllib import quote as urlquote
-except ImportError:
-    # Python 3
     from urllib.parse import quote as urlquote
+except ImportError:
+    # Python 2
+    from urllib import quote as urlquote
 
 from rundeck.connection import RundeckConnectionTolerant, RundeckConnection
-from rundeck.util import cull_kwargs, dict2argstring, StringType
+from rundeck.util import (
+    cull_kwargs,
+    dict2argstring,
+    threaded_map,
+    bounded_cache_put,
+    StringType,
+    monotonic)
 from rundeck.exceptions import (
     InvalidResponseFormat,
     InvalidJobDefinitionFormat,
     InvalidDupeOption,
     InvalidUuidOption,
+    RundeckServerError,
+    JobRunTimeout,
     HTTPError)
 from rundeck.defaults import (
     GET,
@@ -27,23 +37,177 @@ from rundeck.defaults import (
     UuidOption,
     JobDefFormat,
     ExecutionOutputFormat,
-    RUNDECK_API_VERSION)
+    RUNDECK_API_VERSION,
+    JOB_RUN_INTERVAL,
+    BATCH_MAX_WORKERS)
+
+
+log = logging.getLogger(__name__)
+
+
+_NODE_ATTR_KEYS = (
+    'name',
+    'hostname',
+    'username',
+    'description',
+    'osArch',
+    'osFamily',
+    'osName',
+    'editUrl',
+    'remoteUrl',
+)
+# (attribute name, serialized attribute prefix) pairs for ``RundeckNode.serialize``
+_NODE_ATTR_PREFIXES = tuple((k, ' ' + k + '=') for k in _NODE_ATTR_KEYS)
+# ``fmt`` keyword arg renamed to the ``format`` API param by ``cull_kwargs``
+_FMT_ALIAS = {'fmt': 'format'}
+_JOBS_KEYS = frozenset(('idlist', 'groupPath', 'jobFilter', 'jobExactFilter', 'groupPathExact'))
+_JOBS_EXPORT_KEYS = frozenset(('fmt', 'idlist', 'groupPath', 'jobFilter'))
+_JOBS_IMPORT_KEYS = frozenset(('fmt', 'dupeOption', 'project', 'uuidOption'))
+_JOB_KEYS = frozenset(('fmt',))
+_JOB_EXECUTIONS_KEYS = frozenset(('status', 'max', 'offset'))
+_EXECUTIONS_KEYS = frozenset((
+    'statusFilter', 'abortedbyFilter', 'userFilter', 'recentFilter',
+    'begin', 'end', 'adhoc', 'jobIdListFilter', 'excludeJobIdListFilter',
+    'jobListFilter', 'excludeJobListFilter', 'groupPath', 'groupPathExact',
+    'excludeGroupPath', 'excludeGroupPathExact', 'jobExactFilter',
+    'excludeJobExactFilter', 'max', 'offset',
+))
+_EXECUTION_OUTPUT_KEYS = frozenset(('fmt', 'offset', 'lastlines', 'lastmod', 'maxlines'))
+_EXECUTION_ABORT_KEYS = frozenset(('asUser',))
+_RUN_COMMAND_KEYS = frozenset((
+    'nodeThreadcount', 'nodeKeepgoing', 'asUser', 'hostname', 'tags',
+    'os-name', 'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname',
+    'exclude-tags', 'exclude-os-name', 'exclude-os-family', 'exclude-os-arch',
+    'exclude-os-version', 'exclude-name',
+))
+# Shared by ``run_script`` and ``run_url``
+_RUN_SCRIPT_KEYS = frozenset((
+    'argString', 'nodeThreadcount', 'nodeKeepgoing', 'asUser',
+    'scriptInterpreter', 'interpreterArgsQuoted', 'hostname', 'tags', 'os-name',
+    'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname', 'exclude-tags',
+    'exclude-os-name', 'exclude-os-family', 'exclude-os-arch', 'exclude-os-version',
+    'exclude-name',
+))
+_JOB_RUN_KEYS = frozenset((
+    'argString', 'loglevel', 'asUser', 'exclude-precedence',
+    'hostname', 'tags', 'os-name', 'os-family', 'os-arch', 'os-version', 'name',
+    'exclude-hostname', 'exclude-tags', 'exclude-os-name', 'exclude-os-family',
+    'exclude-os-arch', 'exclude-os-version', 'exclude-name',
+))
+_PROJECT_RESOURCES_KEYS = frozenset((
+    'fmt', 'scriptInterpreter', 'interpreterArgsQuoted', 'hostname', 'tags',
+    'os-name', 'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname',
+    'exclude-tags', 'exclude-os-name', 'exclude-os-family', 'exclude-os-arch',
+    'exclude-os-version', 'exclude-name',
+))
+_HISTORY_KEYS = frozenset((
+    'jobIdFilter', 'reportIdFilter', 'userFilter', 'startFilter', 'jobListFilter',
+    'excludeJobListFilter', 'recentFilter', 'begin', 'end', 'max', 'offset',
+))
+_API_VERSION_ERROR = 'Call requires API version \'{0}\' or higher'
+# Static fragments of the ``_post_projects`` request body
+_PROJECT_HEAD = '<project>\n  <name>'
+_PROJECT_NAME_CLOSE = '</name>\n'
+_PROJECT_CONFIG_OPEN = '  <config>\n    '
+_PROJECT_PROP_SEP = '    \n'
+_PROJECT_CONFIG_CLOSE = '\n  </config>\n'
+_PROJECT_TAIL = '</project>'
+_TEXT_TYPE = type('')
+_QUOTEATTR_CACHE = {}
+_QUOTEATTR_CACHE_SIZE = 4096
+_QUOTE_PROJECT_CACHE = {}
+_PROJECT_UNSAFE_CHARS = re.compile('[^A-Za-z0-9_.~-]')
+_QUOTE_PROJECT_CACHE_SIZE = 256
+_QUOTEATTR_SPECIAL_CHARS = re.compile('[<>&"\r\n\t]')
+# Values are always wrapped in double quotes, so single quotes are left as is
+_QUOTEATTR_ESCAPE_TABLE = {
+    ord('&'): '&amp;',
+    ord('<'): '&lt;',
+    ord('>'): '&gt;',
+    ord('"'): '&quot;',
+    ord('\n'): '&#10;',
+    ord('\r'): '&#13;',
+    ord('\t'): '&#9;',
+}
+
+
+def _quoteattr(value):
+    '''
+    Memoized equivalent of ``xml.sax.saxutils.quoteattr``, node attribute values such as
+    hostnames, usernames and tags repeat heavily across nodes
+
+    Returns the double quoted and escaped ``str``
+
+    :param value:
+        value of the XML attribute, non string values are converted to ``str``
+    '''
+    if type(value) is not _TEXT_TYPE:
+        value = '{0}'.format(value)
+
+    try:
+        return _QUOTEATTR_CACHE[value]
+    except KeyError:
+        pass
+
+    if _QUOTEATTR_SPECIAL_CHARS.search(value) is None:
+        # Plain values only need to be wrapped in quotes
+        quoted = '"' + value + '"'
+    else:
+        quoted = '"' + value.translate(_QUOTEATTR_ESCAPE_TABLE) + '"'
+
+    return bounded_cache_put(_QUOTEATTR_CACHE, value, quoted, _QUOTEATTR_CACHE_SIZE)
+
+
+def _quote_project(project):
+    '''
+    Memoized percent-encoding of a project name for use as a URL path segment, scripts
+    tend to issue many calls against the same few projects
+
+    Returns the quoted ``str``
+
+    :param project:
+        (str) name of the project
+    '''
+    # Most project names never need percent-encoding
+    if _PROJECT_UNSAFE_CHARS.search(project) is None:
+        return project
+
+    try:
+        return _QUOTE_PROJECT_CACHE[project]
+    except KeyError:
+        pass
+
+    return bounded_cache_put(
+        _QUOTE_PROJECT_CACHE, project, urlquote(project, safe=''), _QUOTE_PROJECT_CACHE_SIZE
+    )
 
 
 def api_version_check(api_version, required_version):
     '''
-    Raises ``NotImplementedError if the api_version of the connection isn't suffiecient
+    Raises ``NotImplementedError`` if the api_version of the connection isn't sufficient
     '''
     if api_version < required_version:
-        raise NotImplementedError(
-            'Call requires API version \'{0}\' or higher'.format(required_version)
-        )
+        raise NotImplementedError(_API_VERSION_ERROR.format(required_version))
+
+
+def _iter_nodes_xml(nodes):
+    '''
+    Generates the ``project_resources_update`` request body one UTF-8 encoded node at a time
+
+    :param nodes:
+        iterable of ``RundeckNode`` objects
+    '''
+    yield b'<nodes>'
+    for node in nodes:
+        yield node.xml.encode('utf-8') + b'\n'
+    yield b'</nodes>'
 
 
 class RundeckNode(object):
     '''
     Represents a Rundeck node for serializing XML
     '''
+    __slots__ = _NODE_ATTR_KEYS + ('tags', 'attributes', '_cached_xml')
 
     def __init__(self, name, hostname, username, **kwargs):
         '''
@@ -84,42 +248,64 @@ class RundeckNode(object):
         self.editUrl = kwargs.get('editUrl', None)
         self.remoteUrl = kwargs.get('remoteUrl', None)
         self.attributes = kwargs.get('attributes', None)
+        self._cached_xml = None
 
-    def serialize(self):
+    def invalidate(self):
         '''
-        Serializes the instance to XML and returns it as a ``string``
-        '''
-        node_attr_keys = (
-            'name',
-            'hostname',
-            'username',
-            'description',
-            'osArch',
-            'osFamily',
-            'osName',
-            'editUrl',
-            'remoteUrl',
-        )
-
-        data = {k: getattr(self, k) for k in node_attr_keys if getattr(self, k, None) is not None}
+        Drops the cached ``xml``, call after changing the node once ``xml`` has been read
+        '''
+        self._cached_xml = None
 
-        if self.tags is not None and hasattr(self.tags, '__iter__'):
-            data['tags'] = ','.join(self.tags)
-        elif isinstance(self.tags, StringType):
-            data['tags'] = self.tags
+    def serialize(self):
+        '''
+        Serializes the instance to XML, stores it as the cached ``xml`` and returns it as a
+        ``string``
+        '''
+        parts = ['<node']
+        append = parts.append
+        quote = _quoteattr
+        for k, prefix in _NODE_ATTR_PREFIXES:
+            v = getattr(self, k, None)
+            if v is not None:
+                append(prefix)
+                append(quote(v))
+
+        tags = self.tags
+        if tags is None or type(tags) is str or isinstance(tags, StringType):
+            pass
+        elif isinstance(tags, (list, tuple)):
+            tags = ','.join(tags)
+        else:
+            try:
+                tags = ','.join(tags)
+            except TypeError:
+                tags = None
 
-        node_xml_attrs = ' '.join(['{0}={1}'.format(k, quoteattr(v)) for k, v in data.items()])
+        if tags is not None:
+            append(' tags=')
+            append(quote(tags))
+        append('>')
 
-        node_attributes = ''
         if self.attributes is not None and isinstance(self.attributes, dict):
-            node_attributes = ''.join(['<attribute name="{0}" value="{1}" />'.format(k, v)
-                                        for k, v in self.attributes.items()])
+            extend = parts.extend
+            for k, v in self.attributes.items():
+                extend(('<attribute name=', quote(k), ' value=', quote(v), ' />'))
 
-        return '<node {0}>{1}</node>'.format(node_xml_attrs, node_attributes)
+        append('</node>')
+        xml = self._cached_xml = ''.join(parts)
+        return xml
 
     @property
     def xml(self):
-        return self.serialize()
+        '''
+        Serialized XML of the node, computed on first access and cached. Changes to the node,
+        reassigned or in place (``tags``, ``attributes``), are not detected, call ``invalidate``
+        or ``serialize`` after making them
+        '''
+        xml = self._cached_xml
+        if xml is None:
+            xml = self._cached_xml = self.serialize()
+        return xml
 
 
 class RundeckApiTolerant(object):
@@ -177,7 +363,20 @@ class RundeckApiTolerant(object):
                 'a valid RundeckConnection: {0}'.format(connection)
             )
 
-        self.requires_version = partial(api_version_check, self.connection.api_version)
+        self._api_version = int(self.connection.api_version)
+        # ``project`` creates missing projects by default when the API supports it
+        self._default_create = self._api_version >= 11
+
+    def requires_version(self, required_version):
+        '''
+        Raises ``NotImplementedError`` if the API version of the connection is lower than
+        ``required_version``
+
+        :param required_version:
+            (int) minimum Rundeck API version required by the call
+        '''
+        if self._api_version < required_version:
+            raise NotImplementedError(_API_VERSION_ERROR.format(required_version))
 
     def _exec(self,
               method,
@@ -240,10 +439,7 @@ class RundeckApiTolerant(object):
             groupPathExact (str):
                 specify an exact group to match or '-' to match the top level jobs only
         '''
-        params = cull_kwargs(
-            ('idlist', 'groupPath', 'jobFilter', 'jobExactFilter', 'groupPathExact'),
-            kwargs
-        )
+        params = cull_kwargs(_JOBS_KEYS, kwargs)
 
         if 'jobExactFilter' in params or 'groupPathExact' in params:
             self.requires_version(2)
@@ -325,17 +521,13 @@ class RundeckApiTolerant(object):
             exclude-name (str):
                 name exclusion filter
         '''
-        params = cull_kwargs(
-            ('argString', 'loglevel', 'asUser', 'exclude-precedence',
-            'hostname', 'tags', 'os-name', 'os-family', 'os-arch', 'os-version', 'name',
-            'exclude-hostname', 'exclude-tags', 'exclude-os-name', 'exclude-os-family',
-            'exclude-os-arch', 'exclude-os-version', 'exclude-name'), kwargs)
+        params = cull_kwargs(_JOB_RUN_KEYS, kwargs)
 
         argString = params.get('argString', None)
-        if argString is not None:
+        if argString is not None and not isinstance(argString, StringType):
             params['argString'] = dict2argstring(argString)
 
-        return self._exec(GET, 'job/{0}/run'.format(job_id), params=params, **kwargs)
+        return self._exec(GET, 'job/%s/run' % job_id, params=params, **kwargs)
 
     def jobs_export(self, project, **kwargs):
         '''
@@ -357,9 +549,7 @@ class RundeckApiTolerant(object):
             jobFilter (str):
                 find job names that include this string
         '''
-        params = cull_kwargs(('fmt', 'idlist', 'groupPath', 'jobFilter'), kwargs)
-        if 'fmt' in params:
-            params['format'] = params.pop('fmt')
+        params = cull_kwargs(_JOBS_EXPORT_KEYS, kwargs, _FMT_ALIAS)
         params['project'] = project
 
         return self._exec(GET, 'jobs/export', params=params, parse_response=False, **kwargs)
@@ -387,10 +577,8 @@ class RundeckApiTolerant(object):
             uuidOption ((str) 'preserve' or 'remove'):
                 preserve or remove UUIDs in imported jobs, preserve may fail if a UUID already exists
         '''
-        data = cull_kwargs(('fmt', 'dupeOption', 'project', 'uuidOption'), kwargs)
+        data = cull_kwargs(_JOBS_IMPORT_KEYS, kwargs, _FMT_ALIAS)
         data['xmlBatch'] = definition
-        if 'fmt' in data:
-            data['format'] = data.pop('fmt')
 
         return self._exec(POST, 'jobs/import', data=data, **kwargs)
 
@@ -408,12 +596,9 @@ class RundeckApiTolerant(object):
                 [default: 'xml']
                 format of the response of one of ``rundeck .defaults.JobDefFormat`` ``values``
         '''
-        params = cull_kwargs(('fmt',), kwargs)
-
-        if 'fmt' in params:
-            params['format'] = params.pop('fmt')
+        params = cull_kwargs(_JOB_KEYS, kwargs, _FMT_ALIAS)
 
-        return self._exec(GET, 'job/{0}'.format(job_id), params=params, parse_response=False, **kwargs)
+        return self._exec(GET, 'job/%s' % job_id, params=params, parse_response=False, **kwargs)
 
     def delete_job(self, job_id, **kwargs):
         '''
@@ -424,7 +609,7 @@ class RundeckApiTolerant(object):
         :param job_id:
             (str) Rundeck job ID
         '''
-        return self._exec(DELETE, 'job/{0}'.format(job_id), parse_response=False, **kwargs)
+        return self._exec(DELETE, 'job/%s' % job_id, parse_response=False, **kwargs)
 
     def jobs_delete(self, idlist, **kwargs):
         '''
@@ -435,17 +620,21 @@ class RundeckApiTolerant(object):
         :param idlist:
             (str) or (list(str, ...)) list of job ids or a string of comma separated job ids to delete
         '''
-        if not isinstance(idlist, StringType) and hasattr(idlist, '__iter__'):
+        if isinstance(idlist, StringType):
+            pass
+        elif isinstance(idlist, (list, tuple)):
             idlist = ','.join(idlist)
+        else:
+            try:
+                idlist = ','.join(map(str, idlist))
+            except TypeError:
+                pass
 
         data = {
             'idlist': idlist,
         }
 
-        try:
-            return self._exec(POST, 'jobs/delete', data=data, **kwargs)
-        except Exception:
-            raise
+        return self._exec(POST, 'jobs/delete', data=data, **kwargs)
 
     def job_executions(self, job_id, **kwargs):
         '''
@@ -466,8 +655,8 @@ class RundeckApiTolerant(object):
                 [default: 0]
                 offset for result set
         '''
-        params = cull_kwargs(('status', 'max', 'offset'), kwargs)
-        return self._exec(GET, 'job/{0}/executions'.format(job_id), params=params, **kwargs)
+        params = cull_kwargs(_JOB_EXECUTIONS_KEYS, kwargs)
+        return self._exec(GET, 'job/%s/executions' % job_id, params=params, **kwargs)
 
     def executions_running(self, project, **kwargs):
         '''
@@ -490,7 +679,7 @@ class RundeckApiTolerant(object):
         :param execution_id:
             (str) Rundeck job execution ID
         '''
-        return self._exec(GET, 'execution/{0}'.format(execution_id), **kwargs)
+        return self._exec(GET, 'execution/%s' % execution_id, **kwargs)
 
     def executions(self, project, **kwargs):
         '''
@@ -554,11 +743,7 @@ class RundeckApiTolerant(object):
             '''
         self.requires_version(5)
 
-        params = cull_kwargs(('statusFilter', 'abortedbyFilter', 'userFilter', 'recentFilter',
-                              'begin', 'end', 'adhoc', 'jobIdListFilter', 'excludeJobIdListFilter',
-                              'jobListFilter', 'excludeJobListFilter', 'groupPath', 'groupPathExact',
-                              'excludeGroupPath', 'excludeGroupPathExact', 'jobExactFilter',
-                              'excludeJobExactFilter', 'max', 'offset'), kwargs)
+        params = cull_kwargs(_EXECUTIONS_KEYS, kwargs)
         params['project'] = project
 
         return self._exec(GET, 'executions', params=params, **kwargs)
@@ -585,13 +770,83 @@ class RundeckApiTolerant(object):
             maxlines (int):
                 maximum number of lines to retrieve from the specified offset
         '''
-        params = cull_kwargs(('fmt', 'offset', 'lastlines', 'lastmod', 'maxlines'), kwargs)
-        if 'fmt' in params:
-            params['format'] = params.pop('fmt')
+        params = cull_kwargs(_EXECUTION_OUTPUT_KEYS, kwargs, _FMT_ALIAS)
 
         parse_response = kwargs.pop('parse_response', False)
 
-        return self._exec(GET, 'execution/{0}/output'.format(execution_id), params=params, parse_response=parse_response, **kwargs)
+        return self._exec(GET, 'execution/%s/output' % execution_id, params=params, parse_response=parse_response, **kwargs)
+
+    def execution_output_stream(self, execution_id, interval=JOB_RUN_INTERVAL, timeout=None, **kwargs):
+        '''
+        Polls Rundeck API GET /execution/[ID]/output <http://rundeck.org/docs/api/index.html#execution-output>
+        until the output is complete, advancing the byte offset between requests
+
+        Returns a generator of Requests responses, raises ``RundeckServerError`` if a poll does not
+        return output and ``JobRunTimeout`` if the output is not complete within ``timeout``
+
+        :param execution_id:
+            (str) Rundeck job execution ID
+
+        :param interval:
+            (int, float) [default: 3] seconds to wait between polls
+
+        :param timeout:
+            (int, float) [default: ``None``] seconds to poll for before giving up, ``None`` polls
+            until the output is complete
+
+        :keyword args:
+            offset (int):
+                byte offset to start reading from in the file, 0 indicates the beginning
+            lastlines (int):
+                number of lines to retrieve from the end of the available output on the
+                first poll (overrides offset)
+            lastmod (int):
+                a unix millisecond timestamp, return output data received after the specified timestamp
+            maxlines (int):
+                maximum number of lines to retrieve from the specified offset per poll
+        '''
+        # The offset and completion state are read back out of each response, so the
+        # format is always JSON
+        kwargs.pop('fmt', None)
+        params = cull_kwargs(_EXECUTION_OUTPUT_KEYS, kwargs)
+        params['format'] = 'json'
+        params.setdefault('offset', 0)
+        url = 'execution/%s/output' % execution_id
+        deadline = None if timeout is None else monotonic() + timeout
+
+        while True:
+            response = self._exec(GET, url, params=params, parse_response=False, **kwargs)
+            # Tolerant connections hand error responses back, polling them again would never end
+            if response.status_code != 200:
+                raise RundeckServerError(
+                    'Execution {0} output request failed with HTTP status {1}'.format(
+                        execution_id, response.status_code
+                    )
+                )
+
+            output = response.json()
+            completed = output.get('completed')
+            if completed is None:
+                raise RundeckServerError(
+                    'Execution {0} output response has no completion state: {1}'.format(
+                        execution_id, output.get('message', output.get('error', response.text))
+                    )
+                )
+
+            yield response
+            if completed:
+                break
+
+            if deadline is not None and monotonic() + interval > deadline:
+                raise JobRunTimeout(
+                    'Execution {0} output did not complete within {1} seconds'.format(
+                        execution_id, timeout
+                    )
+                )
+
+            params.pop('lastlines', None)
+            params['offset'] = output.get('offset', params['offset'])
+            time.sleep(interval)
 
     def execution_abort(self, execution_id, **kwargs):
         '''
@@ -606,8 +861,8 @@ class RundeckApiTolerant(object):
             asUser (str):
                 specifies a username identifying the user who aborted the execution of job ID ``execution_id``
         '''
-        params = cull_kwargs(('asUser',), kwargs)
-        return self._exec(GET, 'execution/{0}/abort'.format(execution_id), params=params, **kwargs)
+        params = cull_kwargs(_EXECUTION_ABORT_KEYS, kwargs)
+        return self._exec(GET, 'execution/%s/abort' % execution_id, params=params, **kwargs)
 
     def run_command(self, project, command, **kwargs):
         '''
@@ -656,10 +911,7 @@ class RundeckApiTolerant(object):
             exclude-name (str):
                 name exclusion filter
         '''
-        params = cull_kwargs(('nodeThreadcount', 'nodeKeepgoing', 'asUser', 'hostname', 'tags',
-                              'os-name', 'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname',
-                              'exclude-tags', 'exclude-os-name', 'exclude-os-family', 'exclude-os-arch',
-                              'exclude-os-version', 'exclude-name'), kwargs)
+        params = cull_kwargs(_RUN_COMMAND_KEYS, kwargs)
 
         params['project'] = project
         params['exec'] = command
@@ -721,11 +973,7 @@ class RundeckApiTolerant(object):
             exclude-name (str):
                 name exclusion filter
         '''
-        params = cull_kwargs(('argString', 'nodeThreadcount', 'nodeKeepgoing', 'asUser',
-                              'scriptInterpreter', 'interpreterArgsQuoted', 'hostname', 'tags', 'os-name',
-                              'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname', 'exclude-tags',
-                              'exclude-os-name', 'exclude-os-family', 'exclude-os-arch', 'exclude-os-version',
-                              'exclude-name'), kwargs)
+        params = cull_kwargs(_RUN_SCRIPT_KEYS, kwargs)
 
         params['project'] = project
         files = {'scriptFile': scriptFile}
@@ -734,7 +982,7 @@ class RundeckApiTolerant(object):
             self.requires_version(8)
 
         argString = params.get('argString', None)
-        if argString is not None:
+        if argString is not None and not isinstance(argString, StringType):
             params['argString'] = dict2argstring(argString)
 
         return self._exec(POST, 'run/script', params=params, files=files, **kwargs)
@@ -797,11 +1045,7 @@ class RundeckApiTolerant(object):
         '''
         self.requires_version(4)
 
-        data = cull_kwargs(('argString', 'nodeThreadcount', 'nodeKeepgoing', 'asUser',
-                            'scriptInterpreter', 'interpreterArgsQuoted', 'hostname', 'tags', 'os-name',
-                            'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname', 'exclude-tags',
-                            'exclude-os-name', 'exclude-os-family', 'exclude-os-arch', 'exclude-os-version',
-                            'exclude-name'), kwargs)
+        data = cull_kwargs(_RUN_SCRIPT_KEYS, kwargs)
 
         data['project'] = project
         data['scriptURL'] = scriptURL
@@ -810,11 +1054,34 @@ class RundeckApiTolerant(object):
             self.requires_version(8)
 
         argString = data.get('argString', None)
-        if argString is not None:
+        if argString is not None and not isinstance(argString, StringType):
             data['argString'] = dict2argstring(argString)
 
         return self._exec(POST, 'run/url', data=data, **kwargs)
 
+    def run_url_batch(self, specs, max_workers=BATCH_MAX_WORKERS, **kwargs):
+        '''
+        Runs several ``run_url`` calls concurrently, Rundeck has no bulk endpoint for adhoc
+        executions so the requests are fanned out over a thread pool sharing the connection
+
+        Returns a list of class ``rundeck.connection.RundeckResponse`` in the order of ``specs``
+
+        :param specs:
+            (list(dict, ...)) one dict per execution holding the ``project`` and ``scriptURL``
+            plus any ``run_url`` keyword args for that execution
+        :param max_workers:
+            (int) [default: 8] maximum number of concurrent requests
+
+        :keyword args:
+            any ``run_url`` keyword args, applied to every spec unless overridden by the spec
+        '''
+        def run(spec):
+            call_kwargs = dict(kwargs)
+            call_kwargs.update(spec)
+            return self.run_url(**call_kwargs)
+
+        return threaded_map(run, specs, max_workers=max_workers)
+
     def _post_projects(self, project, **kwargs):
         '''
         Wraps Rundeck API POST /projects <http://rundeck.org/docs/api/index.html#project-creation>
@@ -834,22 +1101,19 @@ class RundeckApiTolerant(object):
 
         config = kwargs.pop('config', None)
 
-        prop_tmpl = '<property key="{0}" value="{1}" />'
-        config_tmpl = '  <config>\n' + \
-                      '    {0}\n' + \
-                      '  </config>\n'
-        project_tmpl = '<project>\n' + \
-                       '  <name>{0}</name>\n' + \
-                       '{1}</project>'
-
+        parts = [_PROJECT_HEAD, xml_escape(project), _PROJECT_NAME_CLOSE]
         if config is not None:
-            props_xml = '    \n'.join([prop_tmpl.format(k, v) for k, v in config.items()])
-            config_xml = config_tmpl.format(props_xml)
-        else:
-            config_xml = ''
-
-        xml = project_tmpl.format(project, config_xml)
-        print(xml)
+            parts.append(_PROJECT_CONFIG_OPEN)
+            parts.append(_PROJECT_PROP_SEP.join([
+                '<property key=' + _quoteattr(k) + ' value=' + _quoteattr(v) + ' />'
+                for k, v in config.items()
+            ]))
+            parts.append(_PROJECT_CONFIG_CLOSE)
+        parts.append(_PROJECT_TAIL)
+
+        xml = ''.join(parts)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('project XML: %s', xml)
 
         headers = {'Content-Type': 'application/xml'}
 
@@ -895,14 +1159,11 @@ class RundeckApiTolerant(object):
         # Check if ``kwargs['create']`` is True
         create = kwargs.pop('create', None)
         if create is None:
-            if self.connection.api_version >= 11:
-                create = True
-            else:
-                create = False
+            create = self._default_create
         elif create == True:
             self.requires_version(11)
 
-        rd_url = 'project/{0}'.format(urlquote(project))
+        rd_url = 'project/%s' % _quote_project(project)
 
         project = None
         try:
@@ -959,15 +1220,9 @@ class RundeckApiTolerant(object):
         '''
         self.requires_version(2)
 
-        params = cull_kwargs(('fmt', 'scriptInterpreter', 'interpreterArgsQuoted', 'hostname',
-                              'tags', 'os-name', 'os-family', 'os-arch', 'os-version', 'name', 'exclude-hostname',
-                              'exclude-tags', 'exclude-os-name', 'exclude-os-family', 'exclude-os-arch',
-                              'exclude-os-version', 'exclude-name'), kwargs)
-
-        if 'fmt' in params:
-            params['format'] = params.pop('fmt')
+        params = cull_kwargs(_PROJECT_RESOURCES_KEYS, kwargs, _FMT_ALIAS)
 
-        return self._exec(GET, 'project/{0}/resources'.format(urlquote(project)), params=params, **kwargs)
+        return self._exec(GET, 'project/%s/resources' % _quote_project(project), params=params, **kwargs)
 
     def project_resources_update(self, project, nodes, **kwargs):
         '''
@@ -978,13 +1233,32 @@ class RundeckApiTolerant(object):
         :param project:
             (str) name of the project
         :param nodes:
-            (list) list of RundeckNode objects
+            (list) list of RundeckNode objects, their cached ``xml`` is sent so nodes pushed
+            repeatedly are only serialized once (see ``RundeckNode.invalidate``)
+
+        :keyword args:
+            chunked (bool):
+                [default: ``False``]
+                if ``True`` the nodes are serialized while the request body is sent using chunked
+                transfer encoding instead of being built in memory first, ``nodes`` may then be
+                any iterable, e.g. a generator
         '''
         headers = {'Content-Type': 'text/xml'}
+        url = 'project/%s/resources' % _quote_project(project)
+
+        if kwargs.pop('chunked', False):
+            return self._exec(POST, url, data=_iter_nodes_xml(nodes), headers=headers, **kwargs)
 
-        data = '<nodes>{0}</nodes>'.format('\n'.join([node.xml for node in nodes]))
+        # Encode each node straight into one buffer instead of joining a list of strings, the
+        # buffer is sent as is, converting it to ``bytes`` would copy the whole body
+        data = bytearray(b'<nodes>')
+        extend = data.extend
+        for node in nodes:
+            extend(node.xml.encode('utf-8'))
+            extend(b'\n')
+        extend(b'</nodes>')
 
-        return self._exec(POST, 'project/{0}/resources'.format(urlquote(project)), data=data, headers=headers, **kwargs)
+        return self._exec(POST, url, data=data, headers=headers, **kwargs)
 
     def project_resources_refresh(self, project, providerURL=None, **kwargs):
         '''
@@ -1000,11 +1274,9 @@ class RundeckApiTolerant(object):
         '''
         self.requires_version(2)
 
-        data = {}
-        if providerURL is not None:
-            data['providerURL'] = providerURL
+        data = {'providerURL': providerURL} if providerURL is not None else None
 
-        return self._exec(POST, 'project/{0}/resources/refresh'.format(project), data=data, **kwargs)
+        return self._exec(POST, 'project/%s/resources/refresh' % _quote_project(project), data=data, **kwargs)
 
     def history(self, project, **kwargs):
         '''
@@ -1051,13 +1323,72 @@ class RundeckApiTolerant(object):
                 offset for result
         '''
         self.requires_version(4)
-        params = cull_kwargs(('jobIdFilter', 'reportIdFilter', 'userFilter', 'startFilter',
-                              'jobListFilter', 'excludeJobListFilter', 'recentFilter', 'begin', 'end', 'max',
-                              'offset'), kwargs)
+        params = cull_kwargs(_HISTORY_KEYS, kwargs)
 
         params['project'] = project
         return self._exec(GET, 'history', params=params, **kwargs)
 
+    def history_batch(self, projects, max_workers=BATCH_MAX_WORKERS, **kwargs):
+        '''
+        Fetches the history of several projects concurrently over a thread pool sharing the
+        connection
+
+        Returns a list of class ``rundeck.connection.RundeckResponse`` in the order of ``projects``
+
+        :param projects:
+            (list(str, ...)) names of the projects
+        :param max_workers:
+            (int) [default: 8] maximum number of concurrent requests
+
+        :keyword args:
+            any ``history`` keyword args, applied to every project
+        '''
+        self.requires_version(4)
+        return threaded_map(lambda project: self.history(project, **kwargs), projects, max_workers=max_workers)
+
+    def history_iter(self, project, page_size=20, **kwargs):
+        '''
+        Pages through the history of ``project``, the next page is requested in the background
+        while the current one is being consumed
+
+        Returns a generator of class ``rundeck.connection.RundeckResponse``, one per page
+
+        :param project:
+            (str) name of the project
+        :param page_size:
+            (int) [default: 20] number of events requested per page
+
+        :keyword args:
+            any ``history`` keyword args, ``offset`` sets the offset of the first page and ``max``
+            is replaced by ``page_size``
+        '''
+        self.requires_version(4)
+        kwargs.pop('max', None)
+        offset = int(kwargs.pop('offset', 0))
+
+        def fetch(page_offset):
+            return self.history(project, max=page_size, offset=page_offset, **kwargs)
+
+        # Imported here so ``import rundeck`` does not pay for ``multiprocessing``
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(1)
+        try:
+            pending = pool.apply_async(fetch, (offset,))
+            while True:
+                page = pending.get()
+                events = page.etree.find('events')
+                if events is None or int(events.get('count', 0)) < page_size:
+                    yield page
+                    break
+
+                offset += page_size
+                pending = pool.apply_async(fetch, (offset,))
+                yield page
+        finally:
+            pool.close()
+            pool.join()
+
 
 class RundeckApi(RundeckApiTolerant):
     '''
@@ -3,20 +3,14 @@ Python module for the Rundeck API
 '''
 from __future__ import absolute_import, print_function, unicode_literals # TODO: Test api, util and client classes
 import os
+import re
 import time
-import errno
-import datetime
-
-from string import ascii_letters, digits
-try:
-    from string import maketrans
-except ImportError:
-    maketrans = str.maketrans # Python 3
 
 from rundeck.api import RundeckApiTolerant, RundeckApi, RundeckNode
 from rundeck.connection import RundeckConnection, RundeckResponse
+from rundeck import transforms
 from rundeck.transforms import transform
-from rundeck.util import child2dict, attr2dict, cull_kwargs, StringType
+from rundeck.util import child2dict, attr2dict, cull_kwargs, threaded_map, StringType, monotonic
 from rundeck.exceptions import (
     RundeckServerError,
     JobNotFound,
@@ -24,7 +18,9 @@ from rundeck.exceptions import (
     InvalidJobArgument,
     InvalidResponseFormat,
     InvalidJobDefinitionFormat,
-    InvalidResourceSpecification)
+    InvalidResourceSpecification,
+    JobRunTimeout,
+    HTTPError)
 from rundeck.defaults import (
     GET,
     POST,
@@ -34,16 +30,25 @@ from rundeck.defaults import (
     UuidOption,
     JobDefFormat,
     JOB_RUN_TIMEOUT,
-    JOB_RUN_INTERVAL)
+    JOB_RUN_INTERVAL,
+    BATCH_MAX_WORKERS)
 
 
 
-_JOB_TO_CHARS = ascii_letters + digits
-_JOB_TO_TRANS_TAB = maketrans(_JOB_TO_CHARS, '#' * len(_JOB_TO_CHARS))
-_JOB_ID_TEMPLATE = '########-####-####-####-############'
-_RUNDECK_RESP_FORMATS = ('xml')
-_EXECUTION_COMPLETED = (Status.FAILED, Status.SUCCEEDED, Status.ABORTED)
-_EXECUTION_PENDING = (Status.RUNNING,)
+_JOB_ID_RE = re.compile(
+    r'[0-9A-Za-z]{8}-[0-9A-Za-z]{4}-[0-9A-Za-z]{4}-[0-9A-Za-z]{4}-[0-9A-Za-z]{12}\Z'
+)
+_EXECUTION_COMPLETED = frozenset((Status.FAILED, Status.SUCCEEDED, Status.ABORTED))
+_EXECUTION_PENDING = frozenset((Status.RUNNING,))
+# ``Rundeck.get_execution_output`` format handlers
+_EXECUTION_OUTPUT_HANDLERS = {
+    'text': '_execution_output_text',
+    'json': '_execution_output_json',
+    'xml': '_execution_output_xml',
+}
+_REQUIRED_NODE_KEYS = ('name', 'hostname', 'username')
+_JOB_RUN_INITIAL_INTERVAL = 0.25
+_JOB_RUN_BACKOFF = 1.5
 
 
 def is_job_id(job_id):
@@ -56,11 +61,84 @@ def is_job_id(job_id):
         (str) Rundeck job ID
     '''
     if job_id and isinstance(job_id, StringType):
-        return job_id.translate(_JOB_TO_TRANS_TAB) == _JOB_ID_TEMPLATE
+        # Reject anything that is not UUID sized before running the pattern
+        return len(job_id) == 36 and _JOB_ID_RE.match(job_id) is not None
 
     return False
 
 
+def _as_id_list(idlist):
+    '''
+    Normalizes a comma separated ``str`` or iterable of IDs
+
+    Returns ``tuple`` of the IDs with surrounding whitespace and empty entries removed
+
+    :param idlist:
+        (str or list(str, ...)) comma separated string or list of IDs, non ``str`` IDs are
+        converted to ``str``
+    '''
+    if isinstance(idlist, StringType):
+        idlist = idlist.split(',')
+
+    # IDs may be passed as ints, coerce before stripping
+    stripped = ('{0}'.format(item).strip() for item in idlist)
+    return tuple(item for item in stripped if item)
+
+
+def _node_from_dict(node):
+    '''
+    Builds a ``RundeckNode`` from a ``dict`` holding at least the ``_REQUIRED_NODE_KEYS``
+
+    Returns ``RundeckNode`` or ``None`` if a required key is missing
+
+    :param node:
+        (dict) node specification, the required keys are popped off it
+    '''
+    if all(key in node for key in _REQUIRED_NODE_KEYS):
+        return RundeckNode(node.pop('name'), node.pop('hostname'), node.pop('username'), **node)
+    return None
+
+
+def _node_from_tuple(node):
+    '''
+    Builds a ``RundeckNode`` from a (name, hostname, username) ``tuple``
+
+    Returns ``RundeckNode`` or ``None`` if the tuple is not a three ``tuple``
+
+    :param node:
+        (tuple) node specification
+    '''
+    if len(node) == 3:
+        return RundeckNode(*node)
+    return None
+
+
+# ``Rundeck.update_project_resources`` node builders, keyed on the exact node type
+_NODE_BUILDERS = {
+    dict: _node_from_dict,
+    tuple: _node_from_tuple,
+}
+
+
+def _node_builder(node):
+    '''
+    Looks up the node builder for ``node``, subclasses (``OrderedDict``, ``namedtuple``) miss the
+    exact type lookup and fall back to an ``isinstance`` check
+
+    Returns the builder function or ``None`` if ``node`` is not a supported type
+
+    :param node:
+        node specification
+    '''
+    builder = _NODE_BUILDERS.get(type(node))
+    if builder is None:
+        if isinstance(node, dict):
+            builder = _node_from_dict
+        elif isinstance(node, tuple):
+            builder = _node_from_tuple
+    return builder
+
+
 class Rundeck(object):
 
     def __init__(self, server='localhost', protocol='http', port=4440, api_token=None, **kwargs):
@@ -105,6 +183,21 @@ class Rundeck(object):
         else:
             raise Exception('Supplied api argument is not a valid RundeckApi: {0}'.format(api))
 
+        self._api_version = int(self.api.connection.api_version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''
+        Closes the pooled HTTP connections of the underlying connection, a single client is
+        meant to be reused for the lifetime of the process rather than created per call
+        '''
+        self.api.connection.close()
+
     @transform('system_info')
     def system_info(self, **kwargs):
         '''
@@ -176,19 +269,26 @@ class Rundeck(object):
                 specify an exact group path to match or '-' to match top level jobs only
         '''
         limit = kwargs.pop('limit', None)
-        resp = self.list_jobs(project, **kwargs)
-        jobs = resp
+        job_ids = self._list_job_ids(project, **kwargs)
 
-        job_ids = []
-        if len(jobs) > 0:
-            job_ids = [job['id'] for job in jobs]
-        else:
+        if not job_ids:
             raise JobNotFound(
                 'No jobs in Project {0!r} matching criteria'.format(project)
             )
 
         # Return jobs limited by ``limit`` or all jobs if ``limit`` is ``None``
-        return job_ids[:limit]
+        return job_ids if limit is None else job_ids[:limit]
+
+    @transform('job_ids')
+    def _list_job_ids(self, project, **kwargs):
+        '''
+        Same as ``list_jobs`` but only the job IDs are extracted from the response
+
+        Returns ``list`` of job IDs
+        '''
+        jobs = self.api.jobs(project, **kwargs)
+        jobs.raise_for_error()
+        return jobs
 
     @transform('jobs')
     def list_jobs(self, project, **kwargs):
@@ -225,7 +325,8 @@ class Rundeck(object):
         Wraps ``job_run`` method from ``rundeck.api.RundeckApi`` and implements
         a blocking mechanism to wait for the job to complete
 
-        Returns ``self.execution_status``
+        Returns ``self.execution_status`` of the completed execution, raises
+        ``rundeck.exceptions.JobRunTimeout`` if it does not complete within ``timeout``
 
         :param job_id:
             (str) Rundeck job ID
@@ -236,7 +337,8 @@ class Rundeck(object):
                 number of seconds to wait for a completed status
             interval (int or float):
                 [default: 3]
-                number of seconds to sleep between polling cycles
+                maximum number of seconds to sleep between polling cycles, polling starts
+                at a quarter of a second and backs off towards ``interval``
         '''
         timeout = kwargs.pop('timeout', JOB_RUN_TIMEOUT)
         interval = kwargs.pop('interval', JOB_RUN_INTERVAL)
@@ -244,24 +346,33 @@ class Rundeck(object):
         execution = self._run_job(job_id, **kwargs)
 
         exec_id = execution['id']
-        start = time.time()
+        clock = monotonic
+        sleep = time.sleep
+        start = clock()
         duration = 0
+        # Poll quickly at first so short jobs return early, backing off up to ``interval``
+        delay = min(_JOB_RUN_INITIAL_INTERVAL, interval)
 
         while (duration < timeout):
             execution = self.execution_status(exec_id)
-            try:
-                exec_status = execution['status']
-            except AttributeError:
-                if duration == 0:
-                    continue
+            exec_status = execution.get('status') if execution else None
 
             if exec_status in _EXECUTION_COMPLETED:
-                break
+                return execution
+
+            sleep(min(delay, timeout - duration))
+            delay = min(delay * _JOB_RUN_BACKOFF, interval)
+            duration = clock() - start
 
-            time.sleep(interval)
-            duration = time.time() - start
+        # The last sleep ends at ``timeout``, poll once more so a job that completed during it
+        # is not reported as timed out
+        execution = self.execution_status(exec_id)
+        if execution and execution.get('status') in _EXECUTION_COMPLETED:
+            return execution
 
-        return execution
+        raise JobRunTimeout(
+            'Execution {0} of job {1} did not complete within {2} seconds'.format(exec_id, job_id, timeout)
+        )
 
     @transform('execution')
     def _run_job(self, job_id, **kwargs):
@@ -381,22 +492,19 @@ class Rundeck(object):
         '''
         fmt = kwargs.pop('file_format', None)
         if fmt is None:
-            fmt = JobDefFormat.XML
-            fmt_specified = False
-        else:
-            fmt_specified = True
-
-        definition = open(file_path, 'r').read()
-
-        if not fmt_specified:
             # Get file extension
             fmt = os.path.splitext(file_path.strip())[1][1:].lower()
 
+        # Validate the format before paying for the read
         if fmt not in JobDefFormat.values:
             raise InvalidJobDefinitionFormat(
                 'Invalid job definition format: \'{0}\''.format(fmt)
             )
 
+        # Read as bytes, the definition is sent as is without a decode/encode round trip
+        with open(file_path, 'rb') as definition_file:
+            definition = definition_file.read()
+
         return self.import_job(definition, fmt=fmt, **kwargs)
 
     def export_job(self, job_id, **kwargs):
@@ -425,53 +533,72 @@ class Rundeck(object):
             (str) Rundeck job ID
         '''
         result = self.api.delete_job(job_id, **kwargs)
-        # API version 11 returns a 204 No Content, lder versions use the result xml node
-        if self.api_version >= 11:
-            if result.response.status_code == 204:
-                return True
-            else:
-                return False
-        else:
-            rd_msg = RundeckResponse(result)
-            return rd_msg.success
+        # API version 11 returns a 204 No Content, older versions use the result xml node
+        if self._api_version >= 11:
+            return result.status_code == 204
+
+        return RundeckResponse(result, self._api_version).success
 
     def delete_jobs(self, idlist, **kwargs):
         '''
         Multi job deletion
 
-        Returns: ``list`` of deleted jobs / response
+        Returns: ``list`` with one entry per job, in the order of ``idlist``, an empty ``idlist``
+        returns an empty ``list`` without making a request
+
+        With API version 5 or higher all jobs are deleted with a single bulk request and each
+        entry is a ``bool``, ``True`` if the job was deleted. Otherwise, or if the bulk request
+        fails (an error response, or an HTTP error status raised by ``RundeckConnection``), jobs
+        are deleted one request each and an entry is the ``bool`` returned by
+        ``delete_job``, or the ``RundeckResponse`` of the error if the deletion raised
 
         :param idlist:
             (str or list) ``str`` or ``list`` of job ids or string of comma separated job ids
             to delete
 
-        Example response:
-            {
-            'requestCount': 3,
-            'allsuccessful': False,
-            'succeeded': {
-                'id': '1234-456-789-012345',
-                'message': 'success',
-            },
-            'failed': {
-                'id': '9876-543-210-9876543',
-                'message': 'Job ID 9876-543-210-9876543 does not exist',
-            },
-            }
-        '''
-        if isinstance(idlist, StringType):
-            idlist = idlist.split(',')
-
-        results = []
-        for id in idlist:
-            result = None
+        :keyword args:
+            max_workers (int):
+                [default: 8]
+                maximum number of jobs deleted concurrently
+
+        Example response (bulk):
+            [True, False]
+        '''
+        idlist = _as_id_list(idlist)
+        if not idlist:
+            return []
+        max_workers = kwargs.pop('max_workers', BATCH_MAX_WORKERS)
+
+        # Bulk deletion takes a single request, results are mapped back onto ``idlist``
+        if self._api_version >= 5:
+            try:
+                result = self._delete_jobs_bulk(idlist)
+            except (RundeckServerError, HTTPError):
+                pass
+            else:
+                succeeded = result['succeeded'] or {}
+                deleted = set(job['id'] for job in succeeded.get('jobs', ()))
+                return [job_id in deleted for job_id in idlist]
+
+        def delete(job_id):
             try:
-                result = self.delete_job(id)
+                return self.delete_job(job_id)
             except RundeckServerError as exc:
-                result = exc.rundeck_response
-            results.append(result)
+                return exc.rundeck_response
 
-        return results
+        # Deletes are independent requests, overlap their round trips
+        return threaded_map(delete, idlist, max_workers=max_workers)
+
+    @transform('jobs_delete')
+    def _delete_jobs_bulk(self, idlist, **kwargs):
+        '''
+        Deletes several jobs in a single request (requires API version >= 5)
+
+        Returns ``dict`` of the succeeded and failed deletions
+        '''
+        result = self.api.jobs_delete(idlist, **kwargs)
+        result.raise_for_error()
+        return result
 
     @transform('executions')
     def list_job_executions(self, job_id, **kwargs):
@@ -588,6 +715,12 @@ class Rundeck(object):
     def _execution_output_json(self, execution_id, **kwargs):
         return self.api.execution_output(execution_id, **kwargs)
 
+    def _execution_output_text(self, execution_id, **kwargs):
+        return self.api.execution_output(execution_id, **kwargs).text
+
+    def _execution_output_xml(self, execution_id, **kwargs):
+        return self.api.execution_output(execution_id, parse_response=True, **kwargs)
+
     def get_execution_output(self, execution_id, **kwargs):
         '''
         Get output for an execution in various formats
@@ -615,19 +748,20 @@ class Rundeck(object):
         '''
         raw = kwargs.pop('raw', None)
         fmt = kwargs.pop('fmt', None)
-        if fmt is None and raw is None:
-            fmt = 'json'
-            raw = False
-
         if fmt is None:
-            fmt = 'xml'
+            fmt = 'json' if raw is None else 'xml'
+
+        if raw:
+            return self._execution_output_text(execution_id, fmt=fmt, **kwargs)
+
+        try:
+            handler = _EXECUTION_OUTPUT_HANDLERS[fmt]
+        except KeyError:
+            raise InvalidResponseFormat(
+                'Invalid execution output format: \'{0}\''.format(fmt)
+            )
 
-        if raw or fmt == 'text':
-            return self.api.execution_output(execution_id, fmt=fmt, **kwargs).text
-        elif fmt == 'json':
-            return self._execution_output_json(execution_id, fmt=fmt, **kwargs)
-        elif fmt == 'xml':
-            return self.api.execution_output(execution_id, fmt=fmt, parse_response=True, **kwargs)
+        return getattr(self, handler)(execution_id, fmt=fmt, **kwargs)
 
     @transform('execution_abort')
     def abort_execution(self, execution_id, **kwargs):
@@ -886,9 +1020,9 @@ class Rundeck(object):
             exclude-name (str):
                 name exclusion filter
         '''
-        fmt = kwargs.pop('fmt', 'python')
+        fmt = kwargs.pop('fmt', None) or 'python'
 
-        if fmt is 'python':
+        if fmt == 'python':
             return self._project_resources(project, quiet=True, **kwargs)
         else:
             return self.api.project_resources(project, fmt=fmt, parse_response=False, **kwargs).text
@@ -915,20 +1049,13 @@ class Rundeck(object):
                 '\'nodes\' must be a tuple, dictionary or list of tuples / dictionaries'
             )
 
-        required_keys = ('name', 'hostname', 'username')
         rundeck_nodes = []
         for node in nodes:
-            if isinstance(node, dict) and set(node.keys()).issuperset(required_keys):
-                rundeck_nodes.append(
-                    RundeckNode(
-                        node.pop('name'),
-                        node.pop('hostname'),
-                        node.pop('username'),
-                        **node
-                    )
-                )
-            elif isinstance(node, tuple) and len(node) == 3:
-                rundeck_nodes.append(RundeckNode(*node))
+            builder = _node_builder(node)
+            if builder is not None:
+                rundeck_node = builder(node)
+                if rundeck_node is not None:
+                    rundeck_nodes.append(rundeck_node)
 
         if len(rundeck_nodes) > 0:
             return self.api.project_resources_update(project, rundeck_nodes, **kwargs)
@@ -1013,4 +1140,25 @@ class Rundeck(object):
                 [default: 0]
                 offset for results
         '''
-        return self.api.history(project, **kwargs)
\ No newline at end of file
+        return self.api.history(project, **kwargs)
+
+    def iter_project_history(self, project, page_size=100, **kwargs):
+        '''
+        Iterate over all history events for ``project``, fetching ``page_size`` events per request
+        with the next page requested while the current one is consumed, callers can stop early
+        without fetching the remaining history
+
+        Returns a generator of ``dict`` events
+
+        :param project:
+            (str) name of the project
+        :param page_size:
+            (int) [default: 100] number of events fetched per request
+
+        :keyword args:
+            same filters as ``get_project_history``, ``offset`` sets where to start and ``max``
+            is replaced by ``page_size``
+        '''
+        for page in self.api.history_iter(project, page_size=page_size, **kwargs):
+            for event in transforms.events(page):
+                yield event
\ No newline at end of file
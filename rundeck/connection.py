@@ -4,28 +4,19 @@ Python module for the Rundeck API
 from __future__ import absolute_import, print_function, unicode_literals
 import requests
 
-from functools import wraps
-import xml.dom.minidom as xml_dom
+from requests.adapters import HTTPAdapter
+try:
+    from urllib3.util.retry import Retry
+except ImportError:
+    from requests.packages.urllib3.util.retry import Retry
 
-from rundeck.transforms import ElementTree
+from rundeck.transforms import xml_fromstring
 from rundeck.defaults import RUNDECK_API_VERSION
 from rundeck.exceptions import (InvalidAuthentication,
                                 RundeckServerError,
                                 ApiVersionNotSupported)
 
 
-def memoize(obj):
-    cache = obj.cache = {}
-
-    @wraps
-    def memoizer(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = obj(*args, **kwargs)
-        return cache[key]
-    return memoizer
-
-
 class RundeckResponse(object):
     '''
     RundeckResponse class
@@ -33,53 +24,115 @@ class RundeckResponse(object):
     Handles the responses from the Rundeck API
     '''
 
+    # Paginated calls can hold many responses, slots drop the per-instance ``__dict__``. Lazily
+    # computed values live in the underscored slots, an unset slot means not computed yet
+    __slots__ = ('client_api_version', '_as_dict_method', 'response', '_body', '_etree',
+                 '_api_version', '_success', '_message', '_as_dict', '_pprint')
+
     def __init__(self, response, client_api_version, as_dict_method=None):
         '''
         Parses an XML string into a Python object
 
         :param response:
             instance of the requests.Response returned by the associated command request
+        :param client_api_version:
+            (int) API version of the connection that made the request
+        :param as_dict_method:
+            [default: ``None``]
+            callable taking the ``RundeckResponse`` and returning the ``as_dict`` representation
         '''
         self.client_api_version = client_api_version
-        self._as_dict_method = None
+        self._as_dict_method = as_dict_method
         self.response = response
-        self.body = self.response.text
-        self.etree = ElementTree.fromstring(self.body.encode('utf-8'))
 
-    @memoize
+    @property
+    def body(self):
+        # Decoded on first access, parsing works on the raw bytes and never needs it
+        try:
+            return self._body
+        except AttributeError:
+            self._body = self.response.text
+            return self._body
+
+    @property
+    def etree(self):
+        # Parsed on first access, callers that only need the body never pay for the parse. The
+        # parser reads the encoding from the XML declaration so the bytes are handed over as is
+        try:
+            return self._etree
+        except AttributeError:
+            self._etree = xml_fromstring(self.response.content)
+            return self._etree
+
     def pprint(self):
-        return xml_dom.parseString(self.body).toprettyxml()
+        '''
+        Returns the response body as indented XML, computed once per response
+        '''
+        try:
+            return self._pprint
+        except AttributeError:
+            # ``minidom`` is only needed here, importing it lazily keeps it out of ``import rundeck``
+            import xml.dom.minidom as xml_dom
+            self._pprint = xml_dom.parseString(self.body).toprettyxml()
+            return self._pprint
 
     @property
-    @memoize
     def as_dict(self):
-        if self._as_dict_method is None:
-            return None
-        else:
-            return self._as_dict_method(self)
+        try:
+            return self._as_dict
+        except AttributeError:
+            if self._as_dict_method is None:
+                self._as_dict = None
+            else:
+                self._as_dict = self._as_dict_method(self)
+            return self._as_dict
+
+    def _materialize(self):
+        '''
+        Reads the API version, success flag and message off the root element in a single pass,
+        callers nearly always check ``success`` and then read ``message``
+        '''
+        attrib = self.etree.attrib
+        success = 'success' in attrib
+        term = 'success' if success else 'error'
+
+        message = term
+        message_el = self.etree.find(term)
+        if message_el is not None:
+            text_el = message_el.find('message')
+            if text_el is not None:
+                message = text_el.text
+
+        self._api_version = int(attrib.get('apiversion', -1))
+        self._success = success
+        self._message = message
 
     @property
-    @memoize
     def api_version(self):
-        return int(self.etree.attrib.get('apiversion', -1))
+        try:
+            return self._api_version
+        except AttributeError:
+            self._materialize()
+            return self._api_version
 
     @property
-    @memoize
     def success(self):
         try:
-            return 'success' in self.etree.attrib
-        except Exception:
-            return False
+            return self._success
+        except AttributeError:
+            try:
+                self._materialize()
+            except Exception:
+                self._success = False
+            return self._success
 
     @property
-    @memoize
     def message(self):
-        term = 'success' if self.success else 'error'
-        message_el = self.etree.find(term)
-        if message_el is None:
-            return term
-        else:
-            return message_el.find('message').text
+        try:
+            return self._message
+        except AttributeError:
+            self._materialize()
+            return self._message
 
     def raise_for_error(self, msg=None):
         if msg is None:
@@ -130,6 +183,13 @@ class RundeckConnectionTolerant(object):
                 Rundeck API version
             verify_cert (bool):
                 Server certificate verification (``https`` only)
+            pool_size (int):
+                [default: 10]
+                number of keep-alive connections kept open to the Rundeck server
+            max_retries (int or ``Retry``):
+                [default: 3 retries with backoff on connection errors and 502, 503, 504 responses]
+                retry policy of the connection pool, non idempotent requests such as ``POST``
+                are only retried when the connection could not be established
 
         Example:
         >>> client = RundeckConnectionTolerant('somehost-or-ip.com', 'https', 4440, 'apitoken')
@@ -142,6 +202,14 @@ class RundeckConnectionTolerant(object):
         self.api_version = int(kwargs.get('api_version', RUNDECK_API_VERSION))
         self.verify_cert = kwargs.get('verify_cert', True)
         self.base_path = kwargs.get('base_path', None)
+        self.pool_size = int(kwargs.get('pool_size', 10))
+        self.max_retries = kwargs.get('max_retries', None)
+        if self.max_retries is None:
+            # Once retries run out the last response is returned rather than raising ``RetryError``,
+            # so tolerant connections and ``raise_for_error`` still see the server's answer
+            self.max_retries = Retry(
+                total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False
+            )
 
         # Check the Rundeck API version
         if self.api_version < 1 or self.api_version > RUNDECK_API_VERSION:
@@ -170,6 +238,14 @@ class RundeckConnectionTolerant(object):
         self.http = requests.Session()
         self.http.verify = self.verify_cert
 
+        # Connections to the Rundeck server are kept alive and reused by the session
+        # requests already advertises ``Accept-Encoding: gzip, deflate`` and decodes responses
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=self.max_retries
+        )
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+
         # Api version >11 does not include the results node for xml responses
         # so we're using a workaround here provided by rundeck - use a header
         # to specify that rundeck should include teh result node in the response
@@ -192,6 +268,12 @@ class RundeckConnectionTolerant(object):
                     or response.status_code != 200):
                 raise InvalidAuthentication('Password or username is incorrect')
 
+    def close(self):
+        '''
+        Closes the pooled connections held by the HTTP session
+        '''
+        self.http.close()
+
     def make_api_url(self, api_url):
         '''
         Cretes a valid Rundeck URL based on the API and the base URL of
@@ -251,11 +333,8 @@ class RundeckConnectionTolerant(object):
             *Passed to RundeckConnection.request*
         '''
         url = self.make_api_url(url)
-        auth_header = {'X-Rundeck-Auth-Token': self.api_token}
-        if headers is None:
-            headers = auth_header
-        else:
-            headers.update(auth_header)
+        # The auth token is a session header set in ``__init__``, requests merges it into
+        # every request so nothing is added per call
 
         response = self.request(
             method, url, params=params, data=data, headers=headers, files=files, **kwargs
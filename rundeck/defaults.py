@@ -5,12 +5,12 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 
 def enum(name, *seq, **named):
-    values = dict(zip(seq, range(len(seq))), **named)
-    values['values'] = list(values.values())
-    values['keys'] = list(values.keys())
+    members = dict(zip(seq, range(len(seq))), **named)
+    # Snapshot keys and values before adding them, so neither lists the other
+    attrs = dict(members, keys=list(members.keys()), values=list(members.values()), __slots__=())
     # ``unicode_literals`` requires a ``str`` passed into ``type``
     # as first arg
-    return type(str(name), (), values)
+    return type(str(name), (), attrs)
 
 
 Status = enum(
@@ -54,3 +54,4 @@ POST = 'post'
 DELETE = 'delete'
 JOB_RUN_TIMEOUT = 60
 JOB_RUN_INTERVAL = 3
+BATCH_MAX_WORKERS = 8
@@ -42,6 +42,10 @@ class RundeckServerError(Exception):
         super(RundeckServerError, self).__init__(*args)
 
 
+class JobRunTimeout(RundeckServerError):
+    '''The job execution did not complete within the timeout'''
+
+
 class InvalidDupeOption(Exception):
     '''The dupeOption specified is invalid'''
 
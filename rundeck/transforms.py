@@ -8,10 +8,17 @@ import inspect
 from datetime import datetime
 from functools import wraps
 
+# ``lxml`` is an optional speedup (``pip install pyrundeck[fast]``), its ``etree`` is a superset of the
+# ``ElementTree`` API used here and parses large responses (project history, job lists) faster
 try:
-    from oElementTree import ElementTree
+    from lxml import etree as ElementTree
+    HAS_LXML = True
 except ImportError:
-    import xml.etree.ElementTree as ElementTree
+    HAS_LXML = False
+    try:
+        from oElementTree import ElementTree
+    except ImportError:
+        import xml.etree.ElementTree as ElementTree
 
 from rundeck.util import (child2dict,
                           attr2dict,
@@ -22,6 +29,21 @@ from rundeck.util import (child2dict,
 _DATETIME_ISOFORMAT = '%Y-%m-%dT%H:%M:%SZ'
 
 
+def xml_fromstring(data):
+    '''
+    Parses an XML document into an ``ElementTree.Element``
+
+    :param data:
+        (bytes) XML document
+    '''
+    if HAS_LXML:
+        # Unlike ``xml.etree``, lxml 4 resolves entities by default, server supplied XML must not
+        # expand external (``file://``) entities. A parser per call, lxml parsers are not thread safe
+        parser = ElementTree.XMLParser(resolve_entities=False, no_network=True)
+        return ElementTree.fromstring(data, parser)
+    return ElementTree.fromstring(data)
+
+
 def is_transform(func):
     '''
     Simple decorator function that marks a function as a 'transform' which allows the transform
@@ -101,6 +123,13 @@ def jobs(resp):
     return jobs
 
 
+@is_transform
+def job_ids(resp):
+    base = resp.etree.find('jobs')
+    # Only the ``id`` attribute is read, the job child nodes are never turned into dicts
+    return [job_el.get('id') for job_el in base.iterfind('job')]
+
+
 def _project(project_el):
     project = {}
 
@@ -247,18 +276,16 @@ def transform(resp_type):
     '''
     Decorator to take a RundeckResponse and pass it through one of the ``is_transform`` wrapped functions
     '''
+    # Resolve the transform once when decorating instead of on every call
+    try:
+        xform = _transforms[resp_type]
+    except KeyError:
+        raise Exception('Transform does not exist for type: \'{0}\''.format(resp_type))
+
     def inner(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            results = func(self, *args, **kwargs)
-
-            try:
-                xform = _transforms[resp_type]
-            except KeyError:
-                raise Exception('Transform does not exist for type: \'{0}\''.format(resp_type))
-            else:
-                results = xform(results)
-            return results
+            return xform(func(self, *args, **kwargs))
 
         return wrapper
     return inner
@@ -3,6 +3,8 @@ Python module for the Rundeck API
 '''
 from __future__ import absolute_import, print_function, unicode_literals
 
+from rundeck.defaults import BATCH_MAX_WORKERS
+
 
 def child2dict(el):
     '''
@@ -25,32 +27,52 @@ def attr2dict(el):
     :param el:
         ElementTree.Element
     '''
-    return {k: v for k, v in el.items()}
+    return dict(el.attrib)
 
 
 def node2dict(el):
     '''
     Combines both attr2dict and child2dict functions
     '''
-    return dict(list(attr2dict(el).items()) + list(child2dict(el).items()))
+    # Child node values take precedence over attributes of the same name
+    data = dict(el.attrib)
+    data.update((c.tag, c.text) for c in el)
+    return data
 
 
-def cull_kwargs(api_keys, kwargs):
+def cull_kwargs(api_keys, kwargs, aliases=None):
     '''
     Strips the ``api_params`` from kwargs based on the list of api_keys
 
     Returns dictionary of the API params
 
     :param api_keys:
-        (list, set, tuple) an iterable representing the keys of the key value
-        pairs to pull out of kwargs
+        (list, set, frozenset, tuple) an iterable representing the keys of the key value
+        pairs to pull out of kwargs, sets are probed once per keyword arg instead of
+        probing ``kwargs`` once per API key
 
     :param kwargs:
         (dict) dictionary of keyword args
+
+    :param aliases:
+        (dict) optional mapping of keyword arg names to the API param names they are
+        renamed to on extraction, e.g. ``{'fmt': 'format'}``
     '''
+    # Most calls pass no filters at all, skip probing every API key in that case
+    if not kwargs:
+        return {}
+
+    if isinstance(api_keys, (set, frozenset)):
+        keys = [k for k in kwargs if k in api_keys]
+    else:
+        keys = [k for k in api_keys if k in kwargs]
+
+    if aliases:
+        return {aliases.get(k, k): kwargs.pop(k) for k in keys}
+
     # If keyword arg passed into the method calling ``cull_kwargs`` is in ``api_keys`` get the value
     # of ``kwargs`` and assign it to the ``api_key`` in a ``dict``
-    return {k: kwargs.pop(k) for k in api_keys if k in kwargs}
+    return {k: kwargs.pop(k) for k in keys}
 
 
 def dict2argstring(arg_string):
@@ -64,11 +86,64 @@ def dict2argstring(arg_string):
         otherwise if it is a dict, will be converted to a compatible string
     '''
     if isinstance(arg_string, dict):
-        return ' '.join(['-' + str(k) + ' ' + str(v) for k, v in arg_string.items()])
+        return ' '.join(['-%s %s' % (k, v) for k, v in arg_string.items()])
     else:
         return arg_string
 
 
+def bounded_cache_put(cache, key, value, max_size):
+    '''
+    Stores ``value`` under ``key`` in the ``dict`` cache, the cache is cleared first once it holds
+    ``max_size`` entries so memoizing unbounded input never grows it past ``max_size``
+
+    Returns ``value``
+
+    :param cache:
+        (dict) module level cache to store ``value`` in
+    :param key:
+        key to store ``value`` under
+    :param value:
+        value to cache
+    :param max_size:
+        (int) maximum number of entries held by ``cache``
+    '''
+    if len(cache) >= max_size:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def threaded_map(func, iterable, max_workers=BATCH_MAX_WORKERS):
+    '''
+    Calls ``func`` on every item of ``iterable`` from a pool of threads so the HTTP round
+    trips of independent API calls overlap
+
+    Returns a list of the results in the order of ``iterable``, the first exception raised by
+    ``func`` is re-raised
+
+    :param func:
+        callable taking a single item
+    :param iterable:
+        iterable of items to pass to ``func``
+    :param max_workers:
+        [default: ``rundeck.defaults.BATCH_MAX_WORKERS``]
+        (int) maximum number of threads to use
+    '''
+    items = list(iterable)
+    if len(items) < 2 or max_workers < 2:
+        return [func(item) for item in items]
+
+    # Imported here so ``import rundeck`` does not pay for ``multiprocessing``
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(min(max_workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
 try:
     if isinstance('', basestring):
         pass
@@ -76,3 +151,9 @@ except NameError:
     StringType = type('')
 else:
     StringType = basestring
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2
+    from time import time as monotonic
@@ -10,7 +10,8 @@ from rundeck import VERSION
 
 project = 'pyrundeck'
 requires = [
-    'requests>=1.2.0',
+    # ``HTTPAdapter`` taking a urllib3 ``Retry`` with ``raise_on_status``
+    'requests>=2.10.0',
 ]
 
 README = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'README.rst')
@@ -33,6 +34,9 @@ setup(
     maintainer='',
     maintainer_email='',
     install_requires=requires,
+    extras_require={
+        'fast': ['lxml>=4'],
+    },
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',